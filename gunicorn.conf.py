@@ -0,0 +1,5 @@
+from prometheus_client import multiprocess
+
+def child_exit(server, worker):
+    """Drop a finished worker's live metrics so /metrics stops reporting them"""
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,17 +1,63 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, StreamingResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 import os
 import google.generativeai as genai
-import json
+from google.generativeai import caching
+import orjson
 import httpx
-from datetime import datetime
+import certifi
+from datetime import datetime, timedelta, timezone
 import logging
 from dotenv import load_dotenv
+from prometheus_client import Counter, Histogram
+from prometheus_fastapi_instrumentator import Instrumentator
 import re
 import unicodedata
+import math
+import hashlib
+import gzip
+import tempfile
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Literal, Optional, Protocol
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from rapidfuzz import process as fuzzy_process
+except ImportError:
+    fuzzy_process = None
+
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer(__name__)
+except ImportError:
+    tracer = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    # ijson picks its fastest available backend (yajl2_c) automatically
+    import ijson
+except ImportError:
+    ijson = None
 
 # Load environment variables
 load_dotenv()
@@ -20,23 +66,146 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize shared resources on startup and release them on shutdown"""
+    logger.info("PMC Services Chatbot API starting up...")
+    clock_task = asyncio.create_task(refresh_timestamp())
+    if not chatbot.municipal_data:
+        logger.warning("Municipal data not loaded properly")
+
+    # Keep the chat page in memory instead of reading it on every request
+    try:
+        with open("chatbot.html", "rb") as f:
+            app.state.chatbot_html = f.read()
+        # Compress once at the highest level rather than on every request
+        app.state.chatbot_html_gzip = gzip.compress(app.state.chatbot_html, compresslevel=9)
+    except FileNotFoundError:
+        app.state.chatbot_html = None
+        app.state.chatbot_html_gzip = None
+        logger.warning("chatbot.html not found")
+
+    # One pooled client keeps connections to the PMC API alive between requests
+    app.state.http_client = httpx.AsyncClient(
+        timeout=15.0,
+        verify=PMC_CA_BUNDLE,
+        headers=PMC_API_HEADERS,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        http2=True
+    )
+    chatbot.http_client = app.state.http_client
+
+    # Pay the connection setup and context upload before the first user does
+    await asyncio.gather(chatbot.warm_up(), chatbot.get_cached_model(), chatbot.load_service_embeddings())
+
+    yield
+
+    clock_task.cancel()
+    await app.state.http_client.aclose()
+    await chatbot.release_context_cache()
+
 app = FastAPI(
     title="PMC Services Chatbot API",
     description="Chatbot API for Pune Municipal Corporation Services",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Enable CORS
+# Enable CORS for the front-end origins only (comma-separated CORS_ORIGINS)
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv('CORS_ORIGINS', 'http://localhost:8000,http://localhost:8086').split(',')
+    if origin.strip()
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,  # The chat page sends no cookies or auth headers
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
+    max_age=86400,  # Let browsers cache preflight results for a day
+)
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses, except server-sent event streams
+
+    The gzip encoder buffers small writes, which would hold back streamed
+    chunks until enough data has accumulated.
+    """
+    uncompressed_paths = {"/chat/stream"}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.uncompressed_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress chat replies and the HTML page
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=512)
+
+# Request metrics at /metrics; with PROMETHEUS_MULTIPROC_DIR set (see the
+# Dockerfile) the endpoint serves a MultiProcessCollector summing all workers
+Instrumentator().instrument(app).expose(app)
+
+# Mount only the assets directory, never the application directory itself
+app.mount("/static", StaticFiles(directory="assets", check_dir=True), name="static")
+
+# Gemini model and generation settings (also part of the response cache key)
+MODEL_NAME = 'gemini-2.0-flash-exp'
+GENERATION_CONFIG = {
+    "temperature": 0.3,  # Slightly higher for more natural responses
+    "max_output_tokens": 512,  # Limit to encourage concise responses
+    "top_p": 0.9,
+    "top_k": 40
+}
+
+# Gemini context cache holding the static instructions and services data
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '3600'))
+CONTEXT_CACHE_RETRY_SECONDS = 300
+# Shared by the workers on this host so they all use one context cache
+CONTEXT_CACHE_STATE_PATH = os.getenv(
+    'CONTEXT_CACHE_STATE_PATH', os.path.join(tempfile.gettempdir(), 'pmc-context-cache.json')
 )
 
-# Mount static files directory to serve images and other assets
-app.mount("/static", StaticFiles(directory="."), name="static")
+# Number of previous messages included in the prompt
+HISTORY_TURNS = 5
+
+# Server-side bounds on the conversation history sent by clients
+MAX_HISTORY_TURNS = 10
+MAX_TURN_CHARS = 2000
+
+# Response cache settings
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '3600'))
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Absorb clients polling the same application status
+TRACKING_CACHE_TTL_SECONDS = int(os.getenv('TRACKING_CACHE_TTL_SECONDS', '30'))
+
+# Semantic cache settings (paraphrased questions reuse earlier answers)
+EMBEDDING_MODEL = 'models/embedding-001'
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+
+# Retrieval settings (standalone questions only get the most relevant services)
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '8'))  # 0 always sends all services
+RETRIEVAL_MIN_SCORE = float(os.getenv('RETRIEVAL_MIN_SCORE', '0.7'))
+SERVICE_EMBEDDINGS_PATH = os.getenv('SERVICE_EMBEDDINGS_PATH', 'json data/service_embeddings.npz')
+EMBEDDING_BATCH_SIZE = 100
+
+# PMC application tracking API
+PMC_STATUS_URL = "https://services.pmc.gov.in/getStatusByToken/{application_id}"
+# CA bundle for verifying the PMC certificate; point at a custom bundle if the
+# server sends an incomplete chain
+PMC_CA_BUNDLE = os.getenv('PMC_CA_BUNDLE', certifi.where())
+PMC_API_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+}
 
 # Configure Gemini API
 api_key = os.getenv('GEMINI_API_KEY')
@@ -46,12 +215,196 @@ if not api_key:
     model = None
 else:
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    model = genai.GenerativeModel(MODEL_NAME)
+
+# Static part of the prompt: instructions shared by every request
+PROMPT_INSTRUCTIONS = """You are a friendly, helpful assistant for Pune Municipal Corporation (PMC) services. You're like a knowledgeable government office helper who gives clear, concise answers without overwhelming users with unnecessary details.
+
+KEY INSTRUCTIONS:
+1. **ANALYZE QUESTION TYPE FIRST**: Before responding, determine if it's a general inquiry, specific service request, document question, simple factual query, APPLICATION TRACKING REQUEST, or needs clarification
+2. **APPLICATION TRACKING DETECTION**: If the user asks about tracking, checking status, or mentions application ID/token/reference number, respond with: "TRACK_APPLICATION_REQUEST" followed by your normal helpful response
+3. **COMPLETE INFORMATION REQUIREMENT**: When asked about documents, requirements, or processes, you MUST provide ALL information available in the knowledge base. Do not summarize or truncate document lists - include every single document mentioned in the data.
+4. **DOCUMENT COMPLETENESS**: If the knowledge base shows 16 documents, you must list all 16. If it shows 5 documents, list all 5. Never provide partial lists.
+5. Respond like a human - be friendly, conversational, and direct
+6. Answer exactly what the user is asking for - don't provide extra information unless requested
+7. If they ask "how to get marriage certificate", give them the direct steps and link, not all possible related services
+8. Be concise but complete - provide essential information without jargon or technical details
+9. Only mention service ID if it's directly relevant to their question
+10. If something is unclear, ask for clarification rather than guessing
+11. **IMPORTANT**: When providing links, use this format: LINK:URL (e.g., "LINK:http://example.com"). This will create a clickable "LINK" text instead of showing the full URL.
+
+RESPONSE STYLE:
+- **VARY YOUR RESPONSE OPENERS**: Choose the most appropriate opener based on context and question type:
+  - General help requests: "Sure, I can help you with..." or "I'd be happy to assist with..."
+  - Specific service requests: "For [service name], you'll need..." or "To apply for [service name], follow these steps:"
+  - Document/status questions: "Here's what you need to know about..." or "For [service name], the requirements are:"
+  - Application tracking: "I can help you track your application..." or "To check your application status..."
+  - Clarification needed: "To better assist you, could you please clarify..." or "I need more information about..."
+  - Simple factual questions: Start directly with the answer
+  - Complex processes: "Let me break this down for you..." or "Here are the steps to..."
+  - Follow-up questions: "Regarding your question about..." or "About [topic]..."
+- **MATCH THE USER'S TONE**: If they're casual, be casual. If they're formal, be more professional
+- Give direct, actionable steps without unnecessary pleasantries
+- When mentioning links, use "LINK:URL" format instead of embedding the full URL in text
+- End with an offer for more help: "Let me know if you need anything else!" (only when it makes sense)
+- **DOCUMENT LISTS MUST BE COMPLETE**: When listing documents, include EVERY document from the knowledge base. Count them if needed to ensure completeness.
+- **FORMAT LISTS PROPERLY**: When listing multiple items (documents, steps, requirements), use this exact format:
+  - Item 1
+  - Item 2
+  - Item 3
+  Each item should be on its own line with a dash (-) at the beginning, followed by a space, then the item text
+- Use proper line breaks to make lists readable and well-structured
+- Put each list item on a separate line for better readability
+- **CRITICAL**: Never truncate or summarize document lists. If the data shows 16 documents, list all 16. If it shows 3 documents, list all 3.
+
+RESPONSE EXAMPLES:
+- General question: "What services do you offer?" → "Sure, I can help you with information about PMC services. We offer various municipal services including..."
+- Specific service: "How do I get a marriage certificate?" → "To get a marriage certificate, you'll need to apply online through LINK:http://example.com and submit these documents: - Marriage application form - Proof of age..."
+- Document requirements: "What documents do I need for birth certificate?" → "For a birth certificate, you'll need: - Hospital birth report - Parents' ID proof - Address proof..."
+- Simple question: "What is the contact number?" → "The PMC customer service number is 020-25501000."
+- Clarification: "I need help with property tax" → "To better assist you with property tax, could you please specify if you need help with payment, assessment, or something else?"
+- Application tracking: "I want to track my application" → "TRACK_APPLICATION_REQUEST I can help you track your application status. Please provide your application ID or reference number so I can check the current status for you."
+
+MARATHI RESPONSE EXAMPLES:
+- General question: "तुम्ही कोणत्या सेवा देत?" → "नक्कीच, मी तुम्हाला PMC सेवांबद्दल माहिती देऊ शकतो. आम्ही विविध नगरपालिका सेवा देतो ज्यात..."
+- Specific service: "लग्नाचे प्रमाणपत्र कसे मिळेल?" → "लग्नाचे प्रमाणपत्र मिळवण्यासाठी, तुम्हाला ऑनलाइन अर्ज करावा लागेल LINK:http://example.com आणि हे कागदपत्रे सादर करावी लागतील: - लग्न अर्ज फॉर्म - वयाचा पुरावा..."
+- Document requirements: "जन्म प्रमाणपत्रासाठी कोणते कागदपत्रे लागतात?" → "जन्म प्रमाणपत्रासाठी तुम्हाला हे लागेल: - रुग्णालयातील जन्म अहवाल - पालकांचा ओळखपत्र - पत्ता पुरावा..."
+- Simple question: "संपर्क क्रमांक काय आहे?" → "PMC ग्राहक सेवा क्रमांक 020-25501000 आहे."
+- Application tracking: "माझा अर्ज ट्रॅक करायचा आहे" → "TRACK_APPLICATION_REQUEST मी तुमच्या अर्जाची स्थिती तपासण्यात मदत करू शकतो. कृपया तुमचा अर्ज क्रमांक किंवा संदर्भ क्रमांक द्या जेणेकरून मी तुमच्यासाठी सद्यस्थिती तपासू शकेन."
+
+CRITICAL DOCUMENT COMPLETENESS EXAMPLES:
+- If asked "documents for Marriage Hall License" and the knowledge base has 16 documents, you MUST list all 16 documents, not 8 or 9.
+- If asked "मंगलकार्यालय परवाना साठी कागदपत्रे" and the knowledge base has 16 documents, you MUST list all 16 documents in Marathi.
+- Always count and verify: "Here are all 16 documents required for Marriage Hall License: [list all 16]"
+- Never say "some documents include" or "key documents are" - always say "ALL documents required are" and list every single one."""
+
+# Language-specific instructions
+LANGUAGE_INSTRUCTIONS = {
+    'mr': """
+**LANGUAGE DETECTION**: The user's message contains Marathi Devanagari script. You MUST respond in Marathi (मराठी) using Devanagari script. Be natural and conversational in Marathi, using appropriate Marathi terms for government services and processes.
+""",
+    'en': """
+**LANGUAGE DETECTION**: The user's message is in English. Respond in English as usual.
+"""
+}
+
+PROMPT_REMINDER = """**FINAL REMINDER**: When listing documents, requirements, or processes, you MUST include ALL items from the knowledge base. Do not summarize, truncate, or provide partial lists. If the data contains 16 documents, list all 16. If it contains 3 documents, list all 3. Count the items if needed to ensure completeness.
+
+Please provide a friendly, concise response that directly answers their question."""
+
+# Phrases that indicate the user wants to track an application. Longer phrases
+# containing one of these ("track my", "check status", "follow up") match anyway.
+TRACKING_KEYWORDS = [
+    'track', 'trace', 'status', 'token', 'progress', 'update', 'follow', 'where is my',
+    'check application', 'my application', 'application id', 'application number',
+    'reference number'
+]
+
+# All keywords in one case-insensitive pass over the message
+TRACKING_KEYWORDS_RE = re.compile('|'.join(map(re.escape, TRACKING_KEYWORDS)), re.IGNORECASE)
+
+# Character classes used for language detection
+DEVANAGARI_RE = re.compile(r'[\u0900-\u097F]')
+NON_SPACE_RE = re.compile(r'\S')
+LANGUAGE_SAMPLE_CHARS = 500
+
+# Application ID formats, scanned in a single pass
+APPLICATION_ID_RE = re.compile(
+    r'\b(?:'
+    r'[A-Z]{2,}\d{6,}'        # Pattern like ABC123456 or PL10000004252600772
+    r'|[A-Z]\d{7,}'           # Pattern like A1234567
+    r'|\d{4,6}[-/]\d{4,6}'    # Pattern like 1234-5678 or 1234/5678
+    r'|\d{8,}'                # Pattern like 12345678
+    r')\b'
+)
+
+# Separators used when formatting the services data for the prompt
+DEPARTMENT_SEPARATOR = "=" * 50 + "\n"
+SERVICE_SEPARATOR = "-" * 40 + "\n"
+
+# PMC serves an HTML error page for unknown application IDs
+HTML_RE = re.compile(rb'html', re.IGNORECASE)
+
+# Questions about documents get their answer checked for a complete list
+DOCUMENT_KEYWORDS_RE = re.compile(r'document|कागदपत्र|कागद|पत्र|required|लागणारी|लागतात', re.IGNORECASE)
+BULLET_RE = re.compile(r'^[ \t]*-\s', re.MULTILINE)
+
+# Pattern to match service IDs in generated responses
+SERVICE_ID_RE = re.compile(r'service-\d+')
+
+# Characters carried between streamed chunks so a split service ID is still found
+SERVICE_ID_OVERLAP = 16
+
+# Words used by the /services/search index
+SEARCH_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    """Split text into lowercase search tokens"""
+    return SEARCH_TOKEN_RE.findall(text.lower())
+
+# Chat pipeline metrics
+LLM_LATENCY = Histogram(
+    "llm_latency_seconds",
+    "Time to produce a Gemini answer, including cache lookups",
+    ["outcome"]
+)
+CACHE_HITS = Counter("cache_hit", "Answers served from a response cache", ["cache"])
+STAGE_LATENCY = Histogram("chat_stage_seconds", "Time spent in each chat pipeline stage", ["stage"])
+
+@contextmanager
+def observe_stage(stage):
+    """Time a pipeline stage, and trace it when OpenTelemetry is installed"""
+    started = time.perf_counter()
+    with tracer.start_as_current_span(stage) if tracer else nullcontext():
+        try:
+            yield
+        finally:
+            STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+# Gemini prefixes its answer with this marker when the user wants to track an application
+TRACKING_MARKER = "TRACK_APPLICATION_REQUEST"
+
+def sse_event(payload):
+    """Format a payload as a server-sent event"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
 
 # Pydantic models for request/response
+class ChatTurn(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str = ""
+
+    @field_validator('content', mode='before')
+    @classmethod
+    def truncate_content(cls, value):
+        """Cut overly long messages instead of rejecting the whole request"""
+        if isinstance(value, str):
+            return value[:MAX_TURN_CHARS]
+        return value
+
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: list = []
+    conversation_history: list[ChatTurn] = []
+
+    @field_validator('conversation_history', mode='before')
+    @classmethod
+    def keep_recent_turns(cls, value):
+        """Only recent turns reach the prompt, so drop older ones before validation"""
+        if isinstance(value, list):
+            return value[-MAX_HISTORY_TURNS:]
+        return value
+
+    def history(self):
+        """Conversation history as plain dicts for the chatbot
+
+        Clients that record the new message before sending it repeat it as the
+        last turn; that copy is dropped so a first question still counts as
+        standalone for the semantic cache and service retrieval.
+        """
+        turns = self.conversation_history
+        repeated = self.message[:MAX_TURN_CHARS].strip()
+        if turns and turns[-1].role == "user" and turns[-1].content.strip() == repeated:
+            turns = turns[:-1]
+        return [turn.model_dump() for turn in turns]
 
 class ChatResponse(BaseModel):
     response: str
@@ -67,186 +420,591 @@ class ApplicationTrackResponse(BaseModel):
     token: str
     timestamp: str
 
+class CacheBackend(Protocol):
+    """Storage interface used by LLMCache"""
+    async def get(self, key: str) -> Optional[dict]: ...
+
+    async def set(self, key: str, value: dict, ttl: int) -> None: ...
+
+class InMemoryCacheBackend:
+    """Bounded in-process LRU cache with per-entry expiry"""
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        # Evict least recently used entries beyond the size limit
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class RedisCacheBackend:
+    """Redis cache shared between workers and restarts"""
+    def __init__(self, url, prefix=""):
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key):
+        raw = await self.redis.get(self.prefix + key)
+        return orjson.loads(raw) if raw else None
+
+    async def set(self, key, value, ttl):
+        await self.redis.setex(self.prefix + key, ttl, orjson.dumps(value))
+
+def create_cache_backend(prefix="pmc:chat:", max_entries=CACHE_MAX_ENTRIES):
+    """Use Redis when REDIS_URL is configured, otherwise an in-process LRU"""
+    if REDIS_URL:
+        if aioredis is not None:
+            logger.info(f"Using Redis cache for {prefix}* keys")
+            return RedisCacheBackend(REDIS_URL, prefix)
+        logger.warning("REDIS_URL is set but the redis package is not installed, using in-memory cache")
+    return InMemoryCacheBackend(max_entries)
+
+class LLMCache:
+    """Exact-match cache for Gemini responses"""
+    def __init__(self, backend: CacheBackend, ttl=CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(user_message, conversation_history=None):
+        """Hash everything that influences the generated answer"""
+        payload = {
+            "model": MODEL_NAME,
+            "msg": user_message.strip().lower(),
+            "hist": (conversation_history or [])[-HISTORY_TURNS:],
+            "t": GENERATION_CONFIG["temperature"],
+            "tp": GENERATION_CONFIG["top_p"],
+            "tk": GENERATION_CONFIG["top_k"]
+        }
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    async def get(self, key):
+        try:
+            with observe_stage("cache.get"):
+                value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        try:
+            with observe_stage("cache.set"):
+                await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class SemanticCache:
+    """Nearest-neighbour cache over embeddings of previously answered questions"""
+    LANGUAGE_IDS = {'en': 0, 'mr': 1}
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl=CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._embeddings = None  # (capacity, dim) unit vectors, allocated on first insert
+        self._expires = np.empty(0, dtype=np.float64)
+        self._languages = np.empty(0, dtype=np.int8)
+        self._values = []
+
+    def lookup(self, embedding, language):
+        """Return the cached response of the most similar question, if close enough"""
+        if self._size == 0:
+            self.misses += 1
+            return None
+
+        query = embedding / (np.linalg.norm(embedding) or 1.0)
+        scores = self._embeddings[:self._size] @ query
+
+        # Ignore expired rows and answers given in another language
+        stale = self._expires[:self._size] <= time.monotonic()
+        other_language = self._languages[:self._size] != self.LANGUAGE_IDS.get(language, 0)
+        scores[stale | other_language] = -1.0
+
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            self.hits += 1
+            return self._values[best]
+
+        self.misses += 1
+        return None
+
+    def add(self, embedding, language, value):
+        """Store a response under the embedding of the question that produced it"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if self._embeddings is None:
+            self._allocate(len(embedding), 64)
+
+        if self._size == self.max_entries:
+            self._evict()
+        if self._size == len(self._embeddings):
+            self._allocate(len(embedding), min(self.max_entries, 2 * len(self._embeddings)))
+
+        row = self._size
+        self._embeddings[row] = embedding / (np.linalg.norm(embedding) or 1.0)
+        self._expires[row] = time.monotonic() + self.ttl
+        self._languages[row] = self.LANGUAGE_IDS.get(language, 0)
+        self._values.append(value)
+        self._size += 1
+
+    def _allocate(self, dim, capacity):
+        """Grow the pre-allocated buffers, keeping the existing rows"""
+        embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        expires = np.zeros(capacity, dtype=np.float64)
+        languages = np.zeros(capacity, dtype=np.int8)
+        if self._embeddings is not None:
+            embeddings[:self._size] = self._embeddings[:self._size]
+            expires[:self._size] = self._expires[:self._size]
+            languages[:self._size] = self._languages[:self._size]
+        self._embeddings, self._expires, self._languages = embeddings, expires, languages
+
+    def _evict(self):
+        """Drop expired rows, or the oldest quarter when nothing has expired yet"""
+        keep = self._expires[:self._size] > time.monotonic()
+        if keep.all():
+            keep[:max(1, self._size // 4)] = False
+
+        kept = int(keep.sum())
+        self._embeddings[:kept] = self._embeddings[:self._size][keep]
+        self._expires[:kept] = self._expires[:self._size][keep]
+        self._languages[:kept] = self._languages[:self._size][keep]
+        self._values = [value for value, k in zip(self._values, keep) if k]
+        self._size = kept
+
+    def stats(self):
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+def pid_alive(pid):
+    """Whether a process with this ID is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class ContextCacheRegistry:
+    """Shares one Gemini context cache between the worker processes on a host
+
+    A small JSON file, guarded by an exclusive lock, records the cache name,
+    when it is due for replacement and which processes use it: the first
+    worker creates the cache, the others attach to it, and the last one to
+    shut down deletes it.
+    """
+    def __init__(self, path=CONTEXT_CACHE_STATE_PATH):
+        self.path = path
+
+    @contextmanager
+    def locked(self):
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file closes
+            yield
+
+    def read(self):
+        try:
+            with open(self.path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+
+    def write(self, state):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(tmp_path, self.path)
+
+    def other_users(self, state):
+        return [pid for pid in state.get("users", []) if pid != os.getpid() and pid_alive(pid)]
+
+    def acquire(self, digest, create, attach):
+        """Attach to the current cache for digest, or create() one when there is none
+
+        Blocking; returns (cached_content, refresh_at) with refresh_at in epoch seconds.
+        """
+        with self.locked():
+            state = self.read()
+            cached_content = None
+            if state.get("digest") == digest and state.get("refresh_at", 0) > time.time():
+                try:
+                    cached_content = attach(state["name"])
+                except Exception as e:
+                    logger.warning(f"Shared context cache {state['name']} unavailable, creating a new one: {e}")
+            if cached_content is None:
+                cached_content = create()
+                state = {
+                    "digest": digest,
+                    "name": cached_content.name,
+                    "refresh_at": time.time() + CONTEXT_CACHE_TTL_SECONDS * 0.9,
+                    "users": self.other_users(state),
+                }
+            state["users"] = self.other_users(state) + [os.getpid()]
+            self.write(state)
+            return cached_content, state["refresh_at"]
+
+    def release(self):
+        """Stop using the shared cache; returns its name when no other worker still does"""
+        with self.locked():
+            state = self.read()
+            if os.getpid() not in state.get("users", []):
+                return None
+            state["users"] = self.other_users(state)
+            if state["users"]:
+                self.write(state)
+                return None
+            os.remove(self.path)
+            return state.get("name")
+
+class ServiceRetriever:
+    """Top-K cosine search over embeddings of the individual service blocks"""
+    def __init__(self, top_k=RETRIEVAL_TOP_K, min_score=RETRIEVAL_MIN_SCORE, path=SERVICE_EMBEDDINGS_PATH):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.path = path
+        self.blocks = []
+        self._embeddings = None  # (services, dim) unit vectors
+
+    @property
+    def ready(self):
+        return self._embeddings is not None
+
+    def digest(self):
+        """Identify the service blocks and embedding model the vectors belong to"""
+        h = hashlib.sha256(EMBEDDING_MODEL.encode('utf-8'))
+        for block in self.blocks:
+            h.update(block.encode('utf-8'))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    async def load(self, embed_batch):
+        """Load the embeddings from disk, or compute and save them when stale"""
+        digest = self.digest()
+        try:
+            with np.load(self.path) as saved:
+                if str(saved["digest"]) == digest:
+                    self._embeddings = saved["embeddings"]
+                    logger.info(f"Loaded {len(self.blocks)} service embeddings from {self.path}")
+                    return
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable service embeddings: {e}")
+
+        rows = []
+        for start in range(0, len(self.blocks), EMBEDDING_BATCH_SIZE):
+            rows.extend(await embed_batch(self.blocks[start:start + EMBEDDING_BATCH_SIZE]))
+        embeddings = np.asarray(rows, dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        self._embeddings = embeddings
+        logger.info(f"Computed {len(self.blocks)} service embeddings")
+
+        # Write to a temporary file first so concurrent workers never read a partial one
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, digest=digest, embeddings=embeddings)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save service embeddings: {e}")
+
+    def select(self, embedding):
+        """Return the top-K service blocks, or None when none of them is a close match"""
+        query = embedding / (np.linalg.norm(embedding) or 1.0)
+        scores = self._embeddings @ query
+
+        k = min(self.top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if scores[top[0]] < self.min_score:
+            return None
+        return "".join(self.blocks[i] for i in top)
+
 class MunicipalChatbot:
-    def __init__(self, json_file_path):
+    def __init__(self, json_file_path, cache=None, semantic_cache=None):
+        # Service records and inverted index for /services/search
+        self.services = {}
+        self._index = {}
+        self.retriever = ServiceRetriever() if np is not None and RETRIEVAL_TOP_K > 0 else None
         self.municipal_data = self.load_municipal_data(json_file_path)
+
+        # The instructions and services data never change, so build them once
+        self.services_context = f"MUNICIPAL SERVICES DATA:\n{self.municipal_data}"
+        self._static_prefix = f"{PROMPT_INSTRUCTIONS}\n\n{self.services_context}\n\n"
+
+        # Per-language prompt heads, with and without the static prefix
+        self._question_heads = {
+            language: f"{instructions}\n" for language, instructions in LANGUAGE_INSTRUCTIONS.items()
+        }
+        self._prompt_heads = {
+            language: self._static_prefix + head for language, head in self._question_heads.items()
+        }
+
+        self.cache = cache or LLMCache(create_cache_backend())
+        if semantic_cache is None and np is not None:
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+        self.tracking_cache = LLMCache(create_cache_backend("pmc:track:", 1000), ttl=TRACKING_CACHE_TTL_SECONDS)
+
+        # Shared HTTP client for the PMC API, opened in the app lifespan
+        self.http_client = None
+
+        # Futures of Gemini calls and PMC lookups in progress; chat keys match the
+        # response cache, tracking keys are prefixed with "track:"
+        self._inflight = {}
+
+        # Streamed generations that keep running after their client disconnects
+        self._background_tasks = set()
+
+        # Model bound to the Gemini context cache, created lazily
+        self.cached_model = None
+        self._context_cache_expires_at = 0.0
+        self._context_cache_lock = asyncio.Lock()
+        self.context_cache_registry = ContextCacheRegistry()
         
     def load_municipal_data(self, json_file_path):
         """Load and format municipal services data"""
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            
-            # Convert JSON to readable text format for the model
-            formatted_data = self.format_data_for_context(data)
-            logger.info(f"Loaded municipal data with {len(data)} departments")
-            return formatted_data
+            parts = ["PUNE MUNICIPAL CORPORATION SERVICES DATABASE:\n\n"]
+            department_count = 0
+
+            with open(json_file_path, 'rb') as file:
+                # Stream one department at a time when ijson is available so the
+                # parsed data never has to be held in memory as a whole
+                if ijson is not None:
+                    departments = ijson.items(file, 'item')
+                else:
+                    departments = orjson.loads(file.read())
+
+                # Convert JSON to readable text format for the model
+                for department in departments:
+                    self.append_department_context(parts, department)
+                    department_count += 1
+
+            logger.info(f"Loaded municipal data with {department_count} departments")
+            return "".join(parts)
             
         except Exception as e:
             logger.error(f"Error loading municipal data: {e}")
             return ""
     
-    def format_data_for_context(self, data):
-        """Format JSON data into readable text for the AI model"""
-        context = "PUNE MUNICIPAL CORPORATION SERVICES DATABASE:\n\n"
+    def append_department_context(self, parts, department):
+        """Format one department into readable text for the AI model"""
+        parts.append(f"DEPARTMENT: {department['Department']}\n")
+        parts.append(DEPARTMENT_SEPARATOR)
         
-        for department in data:
-            context += f"DEPARTMENT: {department['Department']}\n"
-            context += "=" * 50 + "\n"
+        for service in department['Service']:
+            self.index_service(department['Department'], service)
+
+            block_start = len(parts)
+            parts.append(f"\nSERVICE: {service['Service']}\n")
+            parts.append(f"Service ID: {service['service_id']}\n")
+            parts.append(f"Description: {service['description']}\n")
             
-            for service in department['Service']:
-                context += f"\nSERVICE: {service['Service']}\n"
-                context += f"Service ID: {service['service_id']}\n"
-                context += f"Description: {service['description']}\n"
-                
-                # Handle documents (can be list or string)
-                docs = service.get('Documents Required', 'No documents specified')
-                if isinstance(docs, list):
-                    if docs and docs != ["No Documents are required"]:
-                        context += f"Required Documents:\n"
-                        for doc in docs:
-                            context += f"   - {doc}\n"
-                    else:
-                        context += f"Required Documents: No documents required\n"
-                else:
-                    context += f"Required Documents: {docs}\n"
-                
-                # Approval process
-                approval_process = service.get('Levels of Approval / process', {})
-                if isinstance(approval_process, dict):
-                    context += f"Approval Process:\n"
-                    for level, approver in approval_process.items():
-                        if approver and approver != "-":
-                            context += f"   {level}: {approver}\n"
+            # Handle documents (can be list or string)
+            docs = service.get('Documents Required', 'No documents specified')
+            if isinstance(docs, list):
+                if docs and docs != ["No Documents are required"]:
+                    parts.append("Required Documents:\n")
+                    for doc in docs:
+                        parts.append(f"   - {doc}\n")
                 else:
-                    context += f"Approval Process: {approval_process}\n"
-                
-                # Physical verification
-                verification = service.get('Physical Verification', 'Not specified')
-                context += f"Physical Verification: {verification}\n"
-                
-                # Output format
-                output_format = service.get('Output Certificate Format', 'Not specified')
-                context += f"Output Certificate Format: {output_format}\n"
-                
-                # Application link
-                app_link = service.get('application link / url', 'Not available')
-                context += f"Application Link: {app_link}\n"
-                
-                context += "-" * 40 + "\n"
+                    parts.append("Required Documents: No documents required\n")
+            else:
+                parts.append(f"Required Documents: {docs}\n")
+            
+            # Approval process
+            approval_process = service.get('Levels of Approval / process', {})
+            if isinstance(approval_process, dict):
+                parts.append("Approval Process:\n")
+                for level, approver in approval_process.items():
+                    if approver and approver != "-":
+                        parts.append(f"   {level}: {approver}\n")
+            else:
+                parts.append(f"Approval Process: {approval_process}\n")
+            
+            # Physical verification
+            verification = service.get('Physical Verification', 'Not specified')
+            parts.append(f"Physical Verification: {verification}\n")
             
-            context += "\n"
+            # Output format
+            output_format = service.get('Output Certificate Format', 'Not specified')
+            parts.append(f"Output Certificate Format: {output_format}\n")
+            
+            # Application link
+            app_link = service.get('application link / url', 'Not available')
+            parts.append(f"Application Link: {app_link}\n")
+            
+            parts.append(SERVICE_SEPARATOR)
+
+            # Keep each service as a standalone block for retrieval
+            if self.retriever is not None:
+                self.retriever.blocks.append(
+                    f"DEPARTMENT: {department['Department']}" + "".join(parts[block_start:])
+                )
         
-        return context
+        parts.append("\n")
     
+    def index_service(self, department_name, service):
+        """Add a service to the in-memory search index"""
+        service_id = service['service_id']
+        self.services[service_id] = {
+            "service_id": service_id,
+            "service": service['Service'],
+            "department": department_name,
+            "description": service['description'],
+            "application_link": service.get('application link / url', 'Not available')
+        }
+
+        for token in set(tokenize(f"{service['Service']} {service['description']}")):
+            self._index.setdefault(token, set()).add(service_id)
+
+    def search_services(self, query, limit=10):
+        """Rank services by the query words they contain, rarer words counting more"""
+        scores = {}
+        for token in set(tokenize(query)):
+            service_ids = self._index.get(token)
+            if not service_ids:
+                continue
+            weight = math.log(1 + len(self.services) / len(service_ids))
+            for service_id in service_ids:
+                scores[service_id] = scores.get(service_id, 0.0) + weight
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+        if ranked:
+            return [{**self.services[service_id], "score": round(scores[service_id], 3)} for service_id in ranked]
+
+        # Fall back to fuzzy name matching for misspelled queries
+        if fuzzy_process is None:
+            return []
+        names = {service_id: record["service"] for service_id, record in self.services.items()}
+        matches = fuzzy_process.extract(query, names, limit=limit, score_cutoff=60)
+        return [{**self.services[service_id], "score": round(score / 100, 3)} for _, score, service_id in matches]
+
     def is_tracking_request(self, user_message):
         """Check if the user message is asking for application tracking"""
-        tracking_keywords = [
-            'track', 'status', 'check application', 'application status', 'track application',
-            'my application', 'application id', 'token', 'check status', 'where is my',
-            'application tracking', 'track my', 'status of', 'check my application',
-            'application number', 'reference number', 'tracking number', 'follow up',
-            'progress', 'update', 'tracker', 'trace', 'follow'
-        ]
-        
-        # Convert to lowercase for case-insensitive matching
-        message_lower = user_message.lower()
-        
-        # Check for tracking keywords
-        return any(keyword in message_lower for keyword in tracking_keywords)
+        return TRACKING_KEYWORDS_RE.search(user_message) is not None
     
     def detect_language(self, text):
         """Detect if the text contains Marathi Devanagari script"""
         if not text:
             return 'en'
         
-        # Count Devanagari characters
-        devanagari_count = 0
-        total_chars = 0
-        
-        for char in text:
-            if char.strip():  # Skip whitespace
-                total_chars += 1
-                # Check if character is in Devanagari Unicode block (U+0900-U+097F)
-                if '\u0900' <= char <= '\u097F':
-                    devanagari_count += 1
+        # The start of a long pasted message is enough to tell the script
+        sample = text[:LANGUAGE_SAMPLE_CHARS]
+
+        # Count non-whitespace and Devanagari (U+0900-U+097F) characters in C
+        total_chars = len(NON_SPACE_RE.findall(sample))
+        if not total_chars:
+            return 'en'
+        devanagari_count = len(DEVANAGARI_RE.findall(sample))
         
         # If more than 30% of characters are Devanagari, consider it Marathi
-        if total_chars > 0 and (devanagari_count / total_chars) > 0.3:
+        if devanagari_count / total_chars > 0.3:
             return 'mr'  # Marathi
         return 'en'  # English (default)
     
     def extract_application_id(self, user_message):
         """Extract application ID from user message if present"""
-        # Look for patterns like: numbers, alphanumeric codes
-        patterns = [
-            r'\b([A-Z]{2}\d{14,})\b',     # Pattern like PL10000004252600772
-            r'\b([A-Z]{2,}\d{6,})\b',     # Pattern like ABC123456
-            r'\b(\d{8,})\b',              # Pattern like 12345678
-            r'\b([A-Z]\d{7,})\b',         # Pattern like A1234567
-            r'\b(\d{4,6}[-/]\d{4,6})\b',  # Pattern like 1234-5678 or 1234/5678
-            r'\b([A-Z]{1,3}\d{10,})\b',   # Pattern for longer alphanumeric IDs
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, user_message)
-            if match:
-                return match.group(1)
-        
-        return None
+        match = APPLICATION_ID_RE.search(user_message)
+        return match.group(0) if match else None
 
     async def track_application(self, application_id):
+        """Track application status, reusing lookups from the last few seconds"""
+        cached = await self.tracking_cache.get(application_id)
+        if cached is not None:
+            CACHE_HITS.labels("tracking").inc()
+            return cached
+
+        async def lookup():
+            result = await self.fetch_application_status(application_id)
+            # Failures are often transient, so only successful lookups are kept
+            if result["success"]:
+                await self.tracking_cache.set(application_id, result)
+            return result
+
+        # Clients polling the same application share one PMC request
+        return await self.coalesce(f"track:{application_id}", lookup)
+
+    async def fetch_application_status(self, application_id):
         """Call PMC API to track application status"""
         try:
-            api_url = f"https://services.pmc.gov.in/getStatusByToken/{application_id}"
+            api_url = PMC_STATUS_URL.format(application_id=application_id)
             
-            # Create client with SSL verification disabled for government websites
-            async with httpx.AsyncClient(
-                timeout=15.0,
-                verify=False,  # Disable SSL verification for government sites
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'application/json, text/plain, */*',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
-                }
-            ) as client:
-                response = await client.get(api_url)
-                
-                logger.info(f"API Response Status: {response.status_code}")
-                logger.info(f"API Response Content: {response.text[:200]}...")
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "data": data
-                        }
-                    except ValueError as e:
-                        # If JSON parsing fails, check if it's HTML (error page)
-                        if 'html' in response.text.lower():
-                            return {
-                                "success": False,
-                                "error": "The application ID was not found in the PMC database"
-                            }
-                        else:
-                            return {
-                                "success": False,
-                                "error": f"Invalid response format from PMC API"
-                            }
-                elif response.status_code == 404:
-                    return {
-                        "success": False,
-                        "error": "Application ID not found in the PMC database"
-                    }
-                else:
+            # Reuse the pooled client opened in the app lifespan
+            client = self.http_client
+            response = await client.get(api_url)
+            
+            logger.info(f"API Response Status: {response.status_code}")
+            logger.info(f"API Response Content: {response.text[:200]}...")
+            
+            if response.status_code == 200:
+                try:
+                    data = orjson.loads(response.content)
                     return {
-                        "success": False,
-                        "error": f"PMC API returned status code {response.status_code}"
+                        "success": True,
+                        "data": data
                     }
-                    
+                except ValueError as e:
+                    # If JSON parsing fails, check if it's HTML (error page)
+                    if HTML_RE.search(response.content):
+                        return {
+                            "success": False,
+                            "error": "The application ID was not found in the PMC database"
+                        }
+                    else:
+                        return {
+                            "success": False,
+                            "error": f"Invalid response format from PMC API"
+                        }
+            elif response.status_code == 404:
+                return {
+                    "success": False,
+                    "error": "Application ID not found in the PMC database"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"PMC API returned status code {response.status_code}"
+                }
+                
         except httpx.TimeoutException:
             return {
                 "success": False,
@@ -264,128 +1022,69 @@ class MunicipalChatbot:
                 "error": f"Unable to fetch application status. Please try again later or contact PMC customer service."
             }
 
-    def create_prompt(self, user_message, conversation_history=None):
-        """Create the prompt for Gemini API"""
+    def create_prompt(self, user_message, conversation_history=None, include_context=True,
+                      services_context=None):
+        """Create the prompt for Gemini API
+
+        With include_context=False only the per-request part is returned and the
+        instructions plus services data are expected to come from the context cache.
+        services_context replaces the full services data with the given blocks.
+        """
         
         # Detect language of the user message
         detected_language = self.detect_language(user_message)
         
+        # The instructions and services data come from the Gemini context cache
+        # when include_context is False
+        if services_context is not None:
+            parts = [
+                f"{PROMPT_INSTRUCTIONS}\n\nMUNICIPAL SERVICES DATA:\n{services_context}\n\n",
+                self._question_heads[detected_language]
+            ]
+        else:
+            heads = self._prompt_heads if include_context else self._question_heads
+            parts = [heads[detected_language]]
+
         # Build conversation context if provided
-        conversation_context = ""
         if conversation_history:
-            conversation_context = "\nCONVERSATION HISTORY:\n"
-            for msg in conversation_history[-5:]:  # Keep last 5 messages for context
+            parts.append("\nCONVERSATION HISTORY:\n")
+            for msg in conversation_history[-HISTORY_TURNS:]:  # Keep last few messages for context
                 role = msg.get('role', 'user')
                 content = msg.get('content', '')
-                conversation_context += f"{role.upper()}: {content}\n"
-            conversation_context += "\n"
-
-        # Language-specific instructions
-        language_instruction = ""
-        if detected_language == 'mr':
-            language_instruction = """
-**LANGUAGE DETECTION**: The user's message contains Marathi Devanagari script. You MUST respond in Marathi (मराठी) using Devanagari script. Be natural and conversational in Marathi, using appropriate Marathi terms for government services and processes.
-"""
-        else:
-            language_instruction = """
-**LANGUAGE DETECTION**: The user's message is in English. Respond in English as usual.
-"""
-
-        prompt = f"""You are a friendly, helpful assistant for Pune Municipal Corporation (PMC) services. You're like a knowledgeable government office helper who gives clear, concise answers without overwhelming users with unnecessary details.
-
-{language_instruction}
-
-KEY INSTRUCTIONS:
-1. **ANALYZE QUESTION TYPE FIRST**: Before responding, determine if it's a general inquiry, specific service request, document question, simple factual query, APPLICATION TRACKING REQUEST, or needs clarification
-2. **APPLICATION TRACKING DETECTION**: If the user asks about tracking, checking status, or mentions application ID/token/reference number, respond with: "TRACK_APPLICATION_REQUEST" followed by your normal helpful response
-3. **COMPLETE INFORMATION REQUIREMENT**: When asked about documents, requirements, or processes, you MUST provide ALL information available in the knowledge base. Do not summarize or truncate document lists - include every single document mentioned in the data.
-4. **DOCUMENT COMPLETENESS**: If the knowledge base shows 16 documents, you must list all 16. If it shows 5 documents, list all 5. Never provide partial lists.
-5. Respond like a human - be friendly, conversational, and direct
-6. Answer exactly what the user is asking for - don't provide extra information unless requested
-7. If they ask "how to get marriage certificate", give them the direct steps and link, not all possible related services
-8. Be concise but complete - provide essential information without jargon or technical details
-9. Only mention service ID if it's directly relevant to their question
-10. If something is unclear, ask for clarification rather than guessing
-11. **IMPORTANT**: When providing links, use this format: LINK:URL (e.g., "LINK:http://example.com"). This will create a clickable "LINK" text instead of showing the full URL.
-
-RESPONSE STYLE:
-- **VARY YOUR RESPONSE OPENERS**: Choose the most appropriate opener based on context and question type:
-  - General help requests: "Sure, I can help you with..." or "I'd be happy to assist with..."
-  - Specific service requests: "For [service name], you'll need..." or "To apply for [service name], follow these steps:"
-  - Document/status questions: "Here's what you need to know about..." or "For [service name], the requirements are:"
-  - Application tracking: "I can help you track your application..." or "To check your application status..."
-  - Clarification needed: "To better assist you, could you please clarify..." or "I need more information about..."
-  - Simple factual questions: Start directly with the answer
-  - Complex processes: "Let me break this down for you..." or "Here are the steps to..."
-  - Follow-up questions: "Regarding your question about..." or "About [topic]..."
-- **MATCH THE USER'S TONE**: If they're casual, be casual. If they're formal, be more professional
-- Give direct, actionable steps without unnecessary pleasantries
-- When mentioning links, use "LINK:URL" format instead of embedding the full URL in text
-- End with an offer for more help: "Let me know if you need anything else!" (only when it makes sense)
-- **DOCUMENT LISTS MUST BE COMPLETE**: When listing documents, include EVERY document from the knowledge base. Count them if needed to ensure completeness.
-- **FORMAT LISTS PROPERLY**: When listing multiple items (documents, steps, requirements), use this exact format:
-  - Item 1
-  - Item 2
-  - Item 3
-  Each item should be on its own line with a dash (-) at the beginning, followed by a space, then the item text
-- Use proper line breaks to make lists readable and well-structured
-- Put each list item on a separate line for better readability
-- **CRITICAL**: Never truncate or summarize document lists. If the data shows 16 documents, list all 16. If it shows 3 documents, list all 3.
-
-RESPONSE EXAMPLES:
-- General question: "What services do you offer?" → "Sure, I can help you with information about PMC services. We offer various municipal services including..."
-- Specific service: "How do I get a marriage certificate?" → "To get a marriage certificate, you'll need to apply online through LINK:http://example.com and submit these documents: - Marriage application form - Proof of age..."
-- Document requirements: "What documents do I need for birth certificate?" → "For a birth certificate, you'll need: - Hospital birth report - Parents' ID proof - Address proof..."
-- Simple question: "What is the contact number?" → "The PMC customer service number is 020-25501000."
-- Clarification: "I need help with property tax" → "To better assist you with property tax, could you please specify if you need help with payment, assessment, or something else?"
-- Application tracking: "I want to track my application" → "TRACK_APPLICATION_REQUEST I can help you track your application status. Please provide your application ID or reference number so I can check the current status for you."
-
-MARATHI RESPONSE EXAMPLES:
-- General question: "तुम्ही कोणत्या सेवा देत?" → "नक्कीच, मी तुम्हाला PMC सेवांबद्दल माहिती देऊ शकतो. आम्ही विविध नगरपालिका सेवा देतो ज्यात..."
-- Specific service: "लग्नाचे प्रमाणपत्र कसे मिळेल?" → "लग्नाचे प्रमाणपत्र मिळवण्यासाठी, तुम्हाला ऑनलाइन अर्ज करावा लागेल LINK:http://example.com आणि हे कागदपत्रे सादर करावी लागतील: - लग्न अर्ज फॉर्म - वयाचा पुरावा..."
-- Document requirements: "जन्म प्रमाणपत्रासाठी कोणते कागदपत्रे लागतात?" → "जन्म प्रमाणपत्रासाठी तुम्हाला हे लागेल: - रुग्णालयातील जन्म अहवाल - पालकांचा ओळखपत्र - पत्ता पुरावा..."
-- Simple question: "संपर्क क्रमांक काय आहे?" → "PMC ग्राहक सेवा क्रमांक 020-25501000 आहे."
-- Application tracking: "माझा अर्ज ट्रॅक करायचा आहे" → "TRACK_APPLICATION_REQUEST मी तुमच्या अर्जाची स्थिती तपासण्यात मदत करू शकतो. कृपया तुमचा अर्ज क्रमांक किंवा संदर्भ क्रमांक द्या जेणेकरून मी तुमच्यासाठी सद्यस्थिती तपासू शकेन."
+                parts.append(f"{role.upper()}: {content}\n")
+            parts.append("\n")
 
-CRITICAL DOCUMENT COMPLETENESS EXAMPLES:
-- If asked "documents for Marriage Hall License" and the knowledge base has 16 documents, you MUST list all 16 documents, not 8 or 9.
-- If asked "मंगलकार्यालय परवाना साठी कागदपत्रे" and the knowledge base has 16 documents, you MUST list all 16 documents in Marathi.
-- Always count and verify: "Here are all 16 documents required for Marriage Hall License: [list all 16]"
-- Never say "some documents include" or "key documents are" - always say "ALL documents required are" and list every single one.
-
-MUNICIPAL SERVICES DATA:
-{self.municipal_data}
-
-{conversation_context}
-
-USER QUESTION: {user_message}
-
-**FINAL REMINDER**: When listing documents, requirements, or processes, you MUST include ALL items from the knowledge base. Do not summarize, truncate, or provide partial lists. If the data contains 16 documents, list all 16. If it contains 3 documents, list all 3. Count the items if needed to ensure completeness.
-
-Please provide a friendly, concise response that directly answers their question."""
-
-        return prompt
+        parts.append(f"\n\nUSER QUESTION: {user_message}\n\n")
+        parts.append(PROMPT_REMINDER)
+        return "".join(parts)
     
     def extract_service_references(self, response_text):
         """Extract service IDs and names from the response"""
-        import re
-        
-        # Pattern to match service IDs
-        service_id_pattern = r'service-\d+'
-        service_ids = re.findall(service_id_pattern, response_text)
-        
-        # For simplicity, return the service IDs found
-        return list(set(service_ids))
+        # Unique service IDs in the order they are mentioned
+        return list(dict.fromkeys(SERVICE_ID_RE.findall(response_text)))
+    
+    def collect_service_references(self, text, found):
+        """Add complete service IDs in text to found and return the tail to rescan
+
+        An ID that reaches the end of text may continue in the next chunk,
+        so it is left in the returned tail instead of being recorded.
+        """
+        keep_from = max(0, len(text) - SERVICE_ID_OVERLAP)
+        for match in SERVICE_ID_RE.finditer(text):
+            if match.end() == len(text):
+                keep_from = min(keep_from, match.start())
+                break
+            found[match.group()] = None
+        return text[keep_from:]
     
     def validate_document_completeness(self, user_message, response_text):
         """Validate that document responses are complete"""
         # Check if the query is about documents
-        document_keywords = ['document', 'कागदपत्र', 'कागद', 'पत्र', 'required', 'लागणारी', 'लागतात']
-        if not any(keyword.lower() in user_message.lower() for keyword in document_keywords):
+        if not DOCUMENT_KEYWORDS_RE.search(user_message):
             return response_text
         
-        # Count documents in response
-        document_count = response_text.count('- ')
+        # Count bulleted lines in the response, not hyphens inside words
+        document_count = len(BULLET_RE.findall(response_text))
         
         # If response has documents but seems incomplete (less than 5), add a note
         if document_count > 0 and document_count < 5:
@@ -393,134 +1092,523 @@ Please provide a friendly, concise response that directly answers their question
         
         return response_text
     
-    async def get_response(self, user_message, conversation_history=None):
-        """Get response from Gemini API"""
+    def create_context_cache(self):
+        """Upload the instructions and services data to a new Gemini context cache"""
+        cached_content = caching.CachedContent.create(
+            model=f"models/{MODEL_NAME}",
+            display_name="pmc-services-context",
+            system_instruction=PROMPT_INSTRUCTIONS,
+            contents=[self.services_context],
+            ttl=timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS)
+        )
+        logger.info(f"Created Gemini context cache {cached_content.name}")
+        return cached_content
+
+    async def refresh_context_cache(self):
+        """Use the context cache shared by this host's workers, creating it if needed"""
+        # A cache made for other instructions or data must not be reused
+        digest = hashlib.sha256(
+            f"{MODEL_NAME}\n{PROMPT_INSTRUCTIONS}\n{self.services_context}".encode('utf-8')
+        ).hexdigest()
+        try:
+            cached_content, refresh_at = await asyncio.to_thread(
+                self.context_cache_registry.acquire, digest, self.create_context_cache, caching.CachedContent.get
+            )
+            self.cached_model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            # Recreate slightly before Gemini expires the cache
+            self._context_cache_expires_at = time.monotonic() + max(refresh_at - time.time(), 0)
+        except Exception as e:
+            self.cached_model = None
+            self._context_cache_expires_at = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+            logger.warning(f"Gemini context caching unavailable, sending full prompts: {e}")
+
+    async def release_context_cache(self):
+        """Delete the shared context cache if this is the last worker using it"""
         try:
-            # First, always check if the message contains an application ID (regardless of other content)
-            app_id = self.extract_application_id(user_message)
+            name = await asyncio.to_thread(self.context_cache_registry.release)
+            if name:
+                await asyncio.to_thread(lambda: caching.CachedContent.get(name).delete())
+                logger.info(f"Deleted Gemini context cache {name}")
+        except Exception as e:
+            logger.warning(f"Could not release the Gemini context cache: {e}")
+
+    async def warm_up(self):
+        """Open the Gemini connection before the first user request arrives"""
+        if model is None:
+            return
+
+        try:
+            await asyncio.wait_for(
+                model.generate_content_async("ping", generation_config={"max_output_tokens": 1}),
+                timeout=10
+            )
+            logger.info("Gemini client warmed up")
+        except Exception as e:
+            logger.warning(f"Gemini warm-up request failed: {e}")
+
+    async def get_cached_model(self):
+        """Return the model bound to the context cache, recreating it when expired"""
+        if model is None or not self.municipal_data:
+            return None
+
+        if time.monotonic() >= self._context_cache_expires_at:
+            async with self._context_cache_lock:
+                if time.monotonic() >= self._context_cache_expires_at:
+                    await self.refresh_context_cache()
+        return self.cached_model
+
+    async def embed_text(self, text):
+        """Embed text with Gemini, returning None when embeddings are unavailable"""
+        try:
+            result = await genai.embed_content_async(
+                model=EMBEDDING_MODEL,
+                content=text,
+                task_type="semantic_similarity"
+            )
+            return np.asarray(result['embedding'], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding request failed: {e}")
+            return None
+
+    async def embed_documents(self, texts):
+        """Embed a batch of texts with Gemini in one request"""
+        result = await genai.embed_content_async(
+            model=EMBEDDING_MODEL,
+            content=texts,
+            task_type="semantic_similarity"
+        )
+        return result['embedding']
+
+    async def load_service_embeddings(self):
+        """Prepare retrieval; without it every prompt carries all services"""
+        if self.retriever is None or model is None:
+            return
+        try:
+            with observe_stage("retrieval.load"):
+                await self.retriever.load(self.embed_documents)
+        except Exception as e:
+            logger.warning(f"Service retrieval disabled, embedding failed: {e}")
+
+    async def retrieve_services_context(self, user_message, query_embedding=None):
+        """Return the blocks of the services relevant to a question, if any stand out"""
+        if self.retriever is None or not self.retriever.ready:
+            return None
+        if query_embedding is None:
+            query_embedding = await self.embed_text(user_message)
+            if query_embedding is None:
+                return None
+        with observe_stage("retrieval.select"):
+            return self.retriever.select(query_embedding)
+
+    async def get_local_response(self, user_message):
+        """Answer tracking requests (and everything without an API key) without Gemini"""
+        # First, always check if the message contains an application ID (regardless of other content)
+        app_id = self.extract_application_id(user_message)
+        
+        if app_id:
+            # We found an application ID, track it immediately
+            logger.info(f"Found application ID: {app_id}, tracking immediately...")
+            tracking_result = await self.track_application(app_id)
             
-            if app_id:
-                # We found an application ID, track it immediately
-                logger.info(f"Found application ID: {app_id}, tracking immediately...")
-                tracking_result = await self.track_application(app_id)
+            if tracking_result["success"]:
+                data = tracking_result["data"]
+                status_message = f"Application Status Update:\n\n"
+                status_message += f"Application ID: {data.get('token', app_id)}\n"
+                status_message += f"Status: {data.get('appStatus', 'Unknown')}\n"
+                status_message += f"Remark: {data.get('remark', 'No additional information')}\n\n"
                 
-                if tracking_result["success"]:
-                    data = tracking_result["data"]
-                    status_message = f"Application Status Update:\n\n"
-                    status_message += f"Application ID: {data.get('token', app_id)}\n"
-                    status_message += f"Status: {data.get('appStatus', 'Unknown')}\n"
-                    status_message += f"Remark: {data.get('remark', 'No additional information')}\n\n"
-                    
-                    # Add status interpretation
-                    status = data.get('appStatus', '').upper()
-                    if status == 'APPROVED':
-                        status_message += "Great news! Your application has been approved. You can proceed to collect your documents or certificate as applicable."
-                    elif status == 'PENDING':
-                        status_message += "Your application is currently being processed. Please wait for further updates."
-                    elif status == 'REJECTED':
-                        status_message += "Your application has been rejected. Please contact the relevant department for more information on next steps."
-                    elif status == 'IN_PROGRESS':
-                        status_message += "Your application is currently in progress. We'll notify you once there's an update."
-                    else:
-                        status_message += "Please contact PMC customer service at 020-25501000 for more details about this status."
-                    
-                    return {
-                        "response": status_message,
-                        "service_references": [],
-                        "is_tracking": True
-                    }
+                # Add status interpretation
+                status = data.get('appStatus', '').upper()
+                if status == 'APPROVED':
+                    status_message += "Great news! Your application has been approved. You can proceed to collect your documents or certificate as applicable."
+                elif status == 'PENDING':
+                    status_message += "Your application is currently being processed. Please wait for further updates."
+                elif status == 'REJECTED':
+                    status_message += "Your application has been rejected. Please contact the relevant department for more information on next steps."
+                elif status == 'IN_PROGRESS':
+                    status_message += "Your application is currently in progress. We'll notify you once there's an update."
                 else:
-                    error_message = f"Sorry, I couldn't retrieve the status for application ID {app_id}. "
-                    error_message += f"Error: {tracking_result['error']}\n\n"
-                    error_message += "Please double-check your application ID and try again, or contact PMC customer service at 020-25501000 for assistance."
-                    
-                    return {
-                        "response": error_message,
-                        "service_references": [],
-                        "is_tracking": True
-                    }
-            
-            # Check if this is a tracking request without an ID
-            elif self.is_tracking_request(user_message):
-                # No application ID found, ask for it
-                ask_for_id = "I can help you track your application status! To check your application, I'll need your application ID or reference number.\n\n"
-                ask_for_id += "Please provide your application ID (it usually looks like ABC123456 or a series of numbers) and I'll get the current status for you."
+                    status_message += "Please contact PMC customer service at 020-25501000 for more details about this status."
                 
                 return {
-                    "response": ask_for_id,
+                    "response": status_message,
                     "service_references": [],
-                    "is_tracking": True,
-                    "needs_app_id": True
+                    "is_tracking": True
                 }
-
-            # If model is not available, return a mock response
-            if model is None:
-                logger.warning("Gemini model not available, returning mock response")
-                mock_response = f"I understand you asked: '{user_message}'. This is a mock response since the Gemini API key is not configured. Please add your GEMINI_API_KEY to the .env file to get real AI responses."
+            else:
+                error_message = f"Sorry, I couldn't retrieve the status for application ID {app_id}. "
+                error_message += f"Error: {tracking_result['error']}\n\n"
+                error_message += "Please double-check your application ID and try again, or contact PMC customer service at 020-25501000 for assistance."
+                
                 return {
-                    "response": mock_response,
-                    "service_references": []
+                    "response": error_message,
+                    "service_references": [],
+                    "is_tracking": True
                 }
+        
+        # Check if this is a tracking request without an ID
+        elif self.is_tracking_request(user_message):
+            # No application ID found, ask for it
+            ask_for_id = "I can help you track your application status! To check your application, I'll need your application ID or reference number.\n\n"
+            ask_for_id += "Please provide your application ID (it usually looks like ABC123456 or a series of numbers) and I'll get the current status for you."
+            
+            return {
+                "response": ask_for_id,
+                "service_references": [],
+                "is_tracking": True,
+                "needs_app_id": True
+            }
+
+        # If model is not available, return a mock response
+        if model is None:
+            logger.warning("Gemini model not available, returning mock response")
+            mock_response = f"I understand you asked: '{user_message}'. This is a mock response since the Gemini API key is not configured. Please add your GEMINI_API_KEY to the .env file to get real AI responses."
+            return {
+                "response": mock_response,
+                "service_references": []
+            }
 
-            prompt = self.create_prompt(user_message, conversation_history)
+        return None
 
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.3,  # Slightly higher for more natural responses
-                    "max_output_tokens": 512,  # Limit to encourage concise responses
-                    "top_p": 0.9,
-                    "top_k": 40
-                }
-            )
+    async def lookup_cache(self, user_message, conversation_history=None):
+        """Check the exact-match and semantic caches
 
-            if response.text:
-                # Check if the response indicates a tracking request
-                is_tracking = "TRACK_APPLICATION_REQUEST" in response.text
-                clean_response = response.text.replace("TRACK_APPLICATION_REQUEST", "").strip()
-                
-                # Validate document completeness
-                validated_response = self.validate_document_completeness(user_message, clean_response)
-                
+        Returns (cached_result, cache_entry); pass cache_entry to store_cache
+        once a fresh answer has been generated.
+        """
+        # Serve repeated questions from the response cache
+        cache_entry = {
+            "key": self.cache.make_key(user_message, conversation_history),
+            "language": self.detect_language(user_message),
+            "embedding": None
+        }
+        cached = await self.cache.get(cache_entry["key"])
+        if cached is not None:
+            logger.info("Response cache hit")
+            CACHE_HITS.labels("exact").inc()
+            return cached, cache_entry
+
+        # Paraphrases of earlier questions reuse their answers; follow-up
+        # questions depend on the conversation, so only standalone ones qualify
+        if self.semantic_cache is not None and not conversation_history:
+            cache_entry["embedding"] = await self.embed_text(user_message)
+            if cache_entry["embedding"] is not None:
+                cached = self.semantic_cache.lookup(cache_entry["embedding"], cache_entry["language"])
+                if cached is not None:
+                    logger.info("Semantic cache hit")
+                    CACHE_HITS.labels("semantic").inc()
+                    await self.cache.set(cache_entry["key"], cached)
+                    return cached, cache_entry
+
+        return None, cache_entry
+
+    async def store_cache(self, cache_entry, result):
+        """Remember a generated answer in both caches"""
+        # Tracking answers depend on the application, not just the question
+        if result.get("is_tracking"):
+            return
+        await self.cache.set(cache_entry["key"], result)
+        if cache_entry["embedding"] is not None:
+            self.semantic_cache.add(cache_entry["embedding"], cache_entry["language"], result)
+
+    async def prepare_generation(self, user_message, conversation_history=None, query_embedding=None):
+        """Pick the model and matching prompt
+
+        Standalone questions get only the relevant services; everything else uses
+        the cached services context, or the full prompt when there is none.
+        """
+        # Follow-up questions depend on the conversation, not just the message
+        if not conversation_history:
+            services_context = await self.retrieve_services_context(user_message, query_embedding)
+            if services_context is not None:
+                with observe_stage("create_prompt"):
+                    return model, self.create_prompt(user_message, services_context=services_context)
+
+        cached_model = await self.get_cached_model()
+        with observe_stage("create_prompt"):
+            if cached_model is not None:
+                return cached_model, self.create_prompt(user_message, conversation_history, include_context=False)
+            return model, self.create_prompt(user_message, conversation_history)
+
+    def invalidate_context_cache(self, error):
+        """Fall back to full prompts until the context cache is recreated"""
+        logger.warning(f"Cached context request failed, retrying with full prompt: {error}")
+        self.cached_model = None
+        self._context_cache_expires_at = 0.0
+
+    def build_result(self, user_message, response_text, service_refs=None):
+        """Turn raw Gemini output into the chat result
+
+        Pass service_refs when they were already collected while streaming.
+        """
+        # Check if the response indicates a tracking request
+        is_tracking = TRACKING_MARKER in response_text
+        clean_response = response_text.replace(TRACKING_MARKER, "").strip()
+
+        # Validate document completeness
+        validated_response = self.validate_document_completeness(user_message, clean_response)
+
+        if service_refs is None:
+            with observe_stage("extract_service_references"):
                 service_refs = self.extract_service_references(validated_response)
-                result = {
-                    "response": validated_response,
-                    "service_references": service_refs
-                }
-                
-                if is_tracking:
-                    result["is_tracking"] = True
-                    result["needs_app_id"] = True
-                    
-                return result
-            else:
-                raise Exception("Empty response from Gemini API")
+        result = {
+            "response": validated_response,
+            "service_references": service_refs
+        }
+
+        if is_tracking:
+            result["is_tracking"] = True
+            result["needs_app_id"] = True
+
+        return result
 
+    async def generate_response(self, user_message, conversation_history, cache_entry):
+        """Call Gemini and cache the answer"""
+        # Await the async client so the event loop keeps serving other requests
+        generator, prompt = await self.prepare_generation(
+            user_message, conversation_history, cache_entry["embedding"]
+        )
+        try:
+            with observe_stage("gemini.generate"):
+                response = await generator.generate_content_async(
+                    prompt,
+                    generation_config=GENERATION_CONFIG
+                )
         except Exception as e:
+            if generator is model:
+                raise
+            self.invalidate_context_cache(e)
+            with observe_stage("gemini.generate"):
+                response = await model.generate_content_async(
+                    self.create_prompt(user_message, conversation_history),
+                    generation_config=GENERATION_CONFIG
+                )
+
+        if not response.text:
+            raise Exception("Empty response from Gemini API")
+
+        result = self.build_result(user_message, response.text)
+        await self.store_cache(cache_entry, result)
+        return result
+
+    def begin_inflight(self, key):
+        """Register a future that concurrent identical requests can await"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def end_inflight(self, key, future, error=None):
+        """Release the key, failing the future for waiters if it never got a result"""
+        if not future.done():
+            future.set_exception(error or Exception("The shared request was cancelled"))
+            future.exception()  # Mark as retrieved when nobody else was waiting
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def join_inflight(self, key):
+        """Wait for an identical request already in progress; None when there is none"""
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            return None
+        logger.info(f"Joining in-flight request {key[:16]}")
+        return await asyncio.shield(inflight)
+
+    async def coalesce(self, key, call):
+        """Await call() once for all concurrent requests with the same key"""
+        joined = await self.join_inflight(key)
+        if joined is not None:
+            return joined
+
+        future = self.begin_inflight(key)
+        try:
+            result = await call()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            self.end_inflight(key, future, e)
+            raise
+        finally:
+            self.end_inflight(key, future)
+
+    async def get_response(self, user_message, conversation_history=None):
+        """Get response from Gemini API"""
+        # Canonical form so identical-looking questions share cache keys and detection
+        user_message = unicodedata.normalize('NFC', user_message)
+        started = None
+        try:
+            local = await self.get_local_response(user_message)
+            if local is not None:
+                return local
+
+            started = time.perf_counter()
+            cached, cache_entry = await self.lookup_cache(user_message, conversation_history)
+            if cached is not None:
+                LLM_LATENCY.labels("cache_hit").observe(time.perf_counter() - started)
+                return cached
+
+            # Identical questions arriving together share a single Gemini call
+            result = await self.coalesce(
+                cache_entry["key"],
+                lambda: self.generate_response(user_message, conversation_history, cache_entry)
+            )
+
+            LLM_LATENCY.labels("ok").observe(time.perf_counter() - started)
+            return result
+
+        except Exception as e:
+            if started is not None:
+                LLM_LATENCY.labels("error").observe(time.perf_counter() - started)
             logger.error(f"Error getting response from Gemini: {e}")
             raise Exception(f"Failed to generate response: {str(e)}")
 
+    async def stream_response(self, user_message, conversation_history=None):
+        """Yield server-sent events carrying the response text as Gemini generates it"""
+        user_message = unicodedata.normalize('NFC', user_message)
+        started = None
+        try:
+            # Local and cached answers are already complete
+            result = await self.get_local_response(user_message)
+            if result is None:
+                started = time.perf_counter()
+                result, cache_entry = await self.lookup_cache(user_message, conversation_history)
+                if result is not None:
+                    LLM_LATENCY.labels("cache_hit").observe(time.perf_counter() - started)
+                else:
+                    # The same question is already being answered for someone else
+                    result = await self.join_inflight(cache_entry["key"])
+                    if result is not None:
+                        LLM_LATENCY.labels("ok").observe(time.perf_counter() - started)
+
+            if result is not None:
+                yield sse_event({"delta": result["response"]})
+                yield sse_event({**result, "done": True, "timestamp": current_timestamp()})
+                return
+
+            # Let identical questions arriving meanwhile wait for this answer. It is
+            # generated in a background task, so it still completes for them if
+            # this client disconnects
+            future = self.begin_inflight(cache_entry["key"])
+            events = asyncio.Queue()
+            self.run_in_background(
+                self.run_stream_generation(user_message, conversation_history, cache_entry, future, events)
+            )
+            while (event := await events.get()) is not None:
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+            LLM_LATENCY.labels("ok").observe(time.perf_counter() - started)
+
+        except Exception as e:
+            if started is not None:
+                LLM_LATENCY.labels("error").observe(time.perf_counter() - started)
+            logger.error(f"Error streaming response from Gemini: {e}")
+            yield sse_event({"error": f"Failed to generate response: {str(e)}", "done": True})
+
+    def run_in_background(self, coro):
+        """Start a task that outlives the request, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def run_stream_generation(self, user_message, conversation_history, cache_entry, future, events):
+        """Feed stream_generation's events into a queue, ending with None
+
+        An error is queued in place of the remaining events; either way the
+        in-flight future is settled for requests that joined it.
+        """
+        try:
+            async for event in self.stream_generation(user_message, conversation_history, cache_entry, future):
+                events.put_nowait(event)
+        except Exception as e:
+            self.end_inflight(cache_entry["key"], future, e)
+            events.put_nowait(e)
+        finally:
+            self.end_inflight(cache_entry["key"], future)
+            events.put_nowait(None)
+
+    async def stream_generation(self, user_message, conversation_history, cache_entry, future):
+        """Stream a fresh Gemini answer as server-sent events, resolving future with the result"""
+        generator, prompt = await self.prepare_generation(
+            user_message, conversation_history, cache_entry["embedding"]
+        )
+        try:
+            response = await generator.generate_content_async(
+                prompt,
+                generation_config=GENERATION_CONFIG,
+                stream=True
+            )
+        except Exception as e:
+            if generator is model:
+                raise
+            self.invalidate_context_cache(e)
+            response = await model.generate_content_async(
+                self.create_prompt(user_message, conversation_history),
+                generation_config=GENERATION_CONFIG,
+                stream=True
+            )
+
+        # Hold back a short tail so a tracking marker split across chunks is never sent
+        raw_parts = []
+        pending = ""
+        emitting = False
+        holdback = len(TRACKING_MARKER) - 1
+        service_refs = {}
+        scan_tail = ""
+        async for chunk in response:
+            raw_parts.append(chunk.text)
+            scan_tail = self.collect_service_references(scan_tail + chunk.text, service_refs)
+            pending = (pending + chunk.text).replace(TRACKING_MARKER, "")
+            if not emitting:
+                pending = pending.lstrip()
+            if len(pending) > holdback:
+                yield sse_event({"delta": pending[:-holdback]})
+                pending = pending[-holdback:]
+                emitting = True
+        if pending.rstrip():
+            yield sse_event({"delta": pending.rstrip()})
+
+        raw_text = "".join(raw_parts)
+        if not raw_text.strip():
+            raise Exception("Empty response from Gemini API")
+        for match in SERVICE_ID_RE.finditer(scan_tail):
+            service_refs[match.group()] = None
+
+        # The final event carries the complete, validated response
+        result = self.build_result(user_message, raw_text, list(service_refs))
+        await self.store_cache(cache_entry, result)
+        future.set_result(result)
+        yield sse_event({**result, "done": True, "timestamp": current_timestamp()})
+
+def current_timestamp():
+    """UTC timestamp with second resolution, refreshed by a background task"""
+    return getattr(app.state, 'now_iso', None) or datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+async def refresh_timestamp():
+    """Update the shared response timestamp once per second"""
+    while True:
+        app.state.now_iso = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        await asyncio.sleep(1)
+
 # Initialize chatbot (adjust path to your JSON file)
 chatbot = MunicipalChatbot('json data/final.json')
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the application"""
-    logger.info("PMC Services Chatbot API starting up...")
-    if not chatbot.municipal_data:
-        logger.warning("Municipal data not loaded properly")
-
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Root endpoint - serves chatbot.html directly"""
-    try:
-        with open("chatbot.html", "r", encoding="utf-8") as f:
-            content = f.read()
-        return HTMLResponse(content=content)
-    except FileNotFoundError:
+    if app.state.chatbot_html is None:
         return HTMLResponse(content="<h1>Chatbot file not found</h1>", status_code=404)
 
-@app.post("/chat", response_model=ChatResponse)
+    # The GZip middleware leaves responses that already carry Content-Encoding alone
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return HTMLResponse(
+            content=app.state.chatbot_html_gzip,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return HTMLResponse(content=app.state.chatbot_html, headers={"Vary": "Accept-Encoding"})
+
+# Responses are built as plain dicts; the models only document the schema
+@app.post("/chat", responses={200: {"model": ChatResponse}})
 async def chat_endpoint(request: ChatRequest):
     """Main chat endpoint"""
     try:
@@ -532,23 +1620,34 @@ async def chat_endpoint(request: ChatRequest):
         # Get response from chatbot
         result = await chatbot.get_response(
             request.message, 
-            request.conversation_history
-        )
-        
-        response = ChatResponse(
-            response=result["response"],
-            timestamp=datetime.now().isoformat(),
-            service_references=result["service_references"]
+            request.history()
         )
         
         logger.info(f"Generated response with {len(result['service_references'])} service references")
-        return response
+        return ORJSONResponse({
+            "response": result["response"],
+            "timestamp": current_timestamp(),
+            "service_references": result["service_references"]
+        })
         
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/track-application")
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Streaming chat endpoint (server-sent events)"""
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    logger.info(f"Received streaming chat request: {request.message[:50]}...")
+
+    return StreamingResponse(
+        chatbot.stream_response(request.message, request.history()),
+        media_type="text/event-stream"
+    )
+
+@app.post("/track-application", responses={200: {"model": ApplicationTrackResponse}})
 async def track_application_endpoint(request: ApplicationTrackRequest):
     """Dedicated endpoint for application tracking"""
     try:
@@ -559,12 +1658,12 @@ async def track_application_endpoint(request: ApplicationTrackRequest):
         
         if result["success"]:
             data = result["data"]
-            return ApplicationTrackResponse(
-                remark=data.get("remark", "OK"),
-                app_status=data.get("appStatus", "Unknown"),
-                token=data.get("token", request.application_id),
-                timestamp=datetime.now().isoformat()
-            )
+            return ORJSONResponse({
+                "remark": data.get("remark", "OK"),
+                "app_status": data.get("appStatus", "Unknown"),
+                "token": data.get("token", request.application_id),
+                "timestamp": current_timestamp()
+            })
         else:
             raise HTTPException(status_code=404, detail=result["error"])
             
@@ -586,26 +1685,27 @@ async def health_check():
             "status": "healthy",
             "api_key": api_key_status,
             "municipal_data": data_status,
-            "timestamp": datetime.now().isoformat()
+            "response_cache": chatbot.cache.stats(),
+            "tracking_cache": chatbot.tracking_cache.stats(),
+            "context_cache": "active" if chatbot.cached_model else "disabled",
+            "semantic_cache": chatbot.semantic_cache.stats() if chatbot.semantic_cache else "disabled",
+            "retrieval": "active" if chatbot.retriever is not None and chatbot.retriever.ready else "disabled",
+            "timestamp": current_timestamp()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
 @app.get("/services/search")
-async def search_services(query: str):
-    """Search for specific services (optional endpoint)"""
+async def search_services(query: str, limit: int = Query(10, ge=1, le=50)):
+    """Search for specific services by name or description"""
     try:
-        # Simple search in the loaded data
-        # This could be enhanced with fuzzy matching
-        results = []
+        results = chatbot.search_services(query, limit)
         
-        # In a real implementation, you'd search through the original JSON
-        # For now, return a simple response
         return {
             "query": query,
             "results": results,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": current_timestamp()
         }
         
     except Exception as e:
@@ -621,7 +1721,7 @@ async def clear_memory():
         return {
             "status": "success",
             "message": "Chat memory cleared successfully",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": current_timestamp()
         }
     except Exception as e:
         logger.error(f"Error clearing memory: {e}")
@@ -630,11 +1730,14 @@ async def clear_memory():
 if __name__ == "__main__":
     import uvicorn
 
-    # Run the server
+    # Run the server with one worker per CPU core (override with WEB_CONCURRENCY)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)),
         reload=False,  # Disabled for testing
         log_level="info"
     )
\ No newline at end of file
@@ -1,75 +1,264 @@
-import time
-import json
+import os
+import subprocess
 import csv
+import threading
+import atexit
+import copy
+import itertools
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selectolax.lexbor import LexborHTMLParser
+import orjson
 
-class PMCServicesScraper:
-    def __init__(self, headless=False):
-        """Initialize the scraper with Chrome driver"""
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.wait = WebDriverWait(self.driver, 15)
-        self.services_data = []
-        
-    def scrape_services(self, url="https://services.pmc.gov.in/home"):
-        """Main method to scrape all services"""
-        print("🚀 Loading PMC services page...")
-        self.driver.get(url)
+# Values used when a section is missing from the service modal
+DEFAULT_DETAILS = {
+    'description': 'No description available',
+    'process': 'No process available',
+    'documents': 'No documents information',
+    'fees': 'No fees information'
+}
+
+# Modal section heading -> (tag of the sibling holding its content, detail key)
+SECTIONS = {
+    'Service Description': ('p', 'description'),
+    'Process': ('p', 'process'),
+    'Required Documents': ('table', 'documents'),
+    'Fees Structure': ('table', 'fees'),
+}
+
+# Looks a service item up by ID, or by position when it has none, then scrolls
+# to and clicks it, all in one call so no element reference can go stale
+OPEN_SERVICE_SCRIPT = """
+const item = (arguments[0] && document.getElementById(arguments[0]))
+    || document.querySelectorAll('.service-item')[arguments[1]];
+if (!item) return false;
+item.scrollIntoView({block: 'center'});
+item.click();
+return true;
+"""
+
+# Fetches a URL from inside the page so the site's cookies and origin apply
+FETCH_HTML_SCRIPT = """
+const done = arguments[arguments.length - 1];
+fetch(arguments[0], {credentials: 'same-origin'})
+    .then(r => r.ok ? r.text() : null)
+    .then(done, () => done(null));
+"""
+
+# Reports whether the service modal is open and loaded in one call; the HTML
+# is only sent once loading has finished, so polls stay small
+MODAL_STATE_SCRIPT = """
+const modal = document.getElementById('modelWindow');
+const text = document.getElementById('modal-text');
+if (!modal || !text) return null;
+const style = getComputedStyle(modal);
+if (style.display === 'none' || style.visibility === 'hidden') return null;
+const loading = text.querySelector('.bouncing-loader') !== null;
+return {loading: loading, html: loading ? null : text.innerHTML};
+"""
+
+MODAL_HTML_SCRIPT = "return document.getElementById('modal-text').innerHTML;"
+
+# Columns of the CSV output
+FIELDNAMES = ['index', 'service_id', 'name', 'description', 'process', 'documents', 'fees']
+
+# Services kept in memory for the summary; everything else goes straight to disk
+PREVIEW_SIZE = 5
+
+# Warm browsers handed back by finished workers, reused by later ones
+_DRIVER_POOL = Queue()
+
+# Numbers the profile directories of local browsers, so each run reuses the same ones
+_PROFILE_SLOTS = itertools.count()
+
+# Requests the scraper never needs, blocked in local browsers through DevTools
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.woff", "*.woff2", "*.ttf"]
+
+def quit_driver(driver):
+    """Quit a browser, ignoring one that has already gone away"""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def acquire_driver(chrome_options, profile_dir=None):
+    """Take a warm browser from the pool, or start one
+
+    With SELENIUM_REMOTE_URL set, new browsers run on that Selenium server
+    (e.g. a Selenium Grid or Browserless container) instead of locally.
+    Local browsers each get their own profile under profile_dir, so the HTTP
+    cache of shared scripts and styles stays warm between runs.
+    """
+    while True:
+        try:
+            driver = _DRIVER_POOL.get_nowait()
+        except Empty:
+            break
+        try:
+            driver.current_url  # Skip browsers that crashed or were closed
+            return driver
+        except Exception:
+            quit_driver(driver)
+    
+    remote_url = os.getenv('SELENIUM_REMOTE_URL')
+    if remote_url:
+        return webdriver.Remote(command_executor=remote_url, options=chrome_options)
+    if profile_dir:
+        # Chrome locks a profile, so concurrent browsers cannot share one
+        chrome_options = copy.deepcopy(chrome_options)
+        slot_dir = os.path.join(profile_dir, f"worker-{next(_PROFILE_SLOTS)}")
+        chrome_options.add_argument(f"--user-data-dir={slot_dir}")
+    
+    # Discard chromedriver's per-command log output
+    driver = webdriver.Chrome(options=chrome_options, service=Service(log_output=subprocess.DEVNULL))
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    except Exception as e:
+        print(f"⚠️ Could not block image and font requests: {str(e)}")
+    return driver
+
+def release_driver(driver):
+    """Return a browser to the pool for the next worker"""
+    _DRIVER_POOL.put(driver)
+
+def shutdown_driver_pool():
+    """Quit every pooled browser"""
+    while True:
+        try:
+            driver = _DRIVER_POOL.get_nowait()
+        except Empty:
+            return
+        quit_driver(driver)
+
+atexit.register(shutdown_driver_pool)
+
+def element_text(node):
+    """Text of an element with whitespace collapsed, like Selenium's .text for a paragraph"""
+    return " ".join(node.text(separator=" ").split())
+
+def table_text(table):
+    """Text of a table, one line per row"""
+    rows = []
+    for row in table.css("tr"):
+        cells = [element_text(cell) for cell in row.iter() if cell.tag in ('th', 'td')]
+        rows.append(" ".join(cell for cell in cells if cell))
+    return "\n".join(row for row in rows if row)
+
+def next_sibling(node, tag):
+    """First following sibling element with the given tag"""
+    sibling = node.next
+    while sibling is not None:
+        if sibling.tag == tag:
+            return sibling
+        sibling = sibling.next
+    return None
+
+def parse_detail(html):
+    """Extract service details from the modal HTML without further driver calls"""
+    details = dict(DEFAULT_DETAILS)
+    tree = LexborHTMLParser(html)
+    
+    # One pass over the headings; the first heading naming a section wins
+    found = set()
+    for heading in tree.css("h3"):
+        title = heading.text()
+        for section, (tag, key) in SECTIONS.items():
+            if key in found or section not in title:
+                continue
+            content = next_sibling(heading, tag)
+            if content is not None:
+                # Documents and fees are tables, the other sections paragraphs
+                details[key] = table_text(content) if tag == 'table' else element_text(content)
+                found.add(key)
+    
+    # If no specific sections found, get all text
+    if not found:
+        root = tree.body or tree.root
+        lines = (line.strip() for line in root.text(separator="\n").split("\n"))
+        all_text = "\n".join(line for line in lines if line)
+        if all_text and len(all_text) > 50:
+            details['description'] = all_text[:500] + "..." if len(all_text) > 500 else all_text
+    
+    return details
+
+class ServiceWorker:
+    """One Chrome session that opens service modals from the services page"""
+    def __init__(self, chrome_options, url, detail_url_template=None, wait_timeout=8, poll=0.15,
+                 profile_dir=None):
+        self.driver = acquire_driver(chrome_options, profile_dir)
+        self.wait = WebDriverWait(self.driver, timeout=wait_timeout, poll_frequency=poll)
+        self.close_wait = WebDriverWait(self.driver, timeout=2, poll_frequency=0.05)
+        self.url = url
+        self.detail_url_template = detail_url_template
+        # Only local Chrome drivers can send DevTools commands
+        self.use_cdp = hasattr(self.driver, 'execute_cdp_cmd')
         
-        # Wait for page to load completely
-        print("⏳ Waiting for services to load...")
-        time.sleep(5)
+    def load_services_page(self):
+        """Open the services page and wait for it to load"""
+        self.driver.get(self.url)
+        try:
+            self.wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".service-item")))
+        except TimeoutException:
+            print("⚠️ Services took too long to load")
         
+    def run_script(self, script):
+        """Run an argument-free page script and return its result
+
+        Local browsers evaluate it over DevTools with Runtime.evaluate, which
+        skips WebDriver's script wrapping and element serialization; remote
+        browsers, or a script that throws there, fall back to execute_script.
+        """
+        if self.use_cdp:
+            response = self.driver.execute_cdp_cmd("Runtime.evaluate", {
+                "expression": f"(() => {{{script}}})()",
+                "returnByValue": True,
+            })
+            if 'exceptionDetails' not in response:
+                return response['result'].get('value')
+        return self.driver.execute_script(script)
+    
+    def fetch_detail_html(self, service_id):
+        """Fetch a service's detail HTML directly, or None when that fails"""
         try:
-            # Find all service items using the exact selector from the page
-            service_elements = self.driver.find_elements(By.CSS_SELECTOR, ".service-item")
-            print(f"✅ Found {len(service_elements)} services to process")
-            
-            if not service_elements:
-                print("❌ No service items found! Check if page loaded correctly.")
-                return self.services_data
-                
-            # Process each service
-            for i, service_element in enumerate(service_elements):
-                print(f"📋 Processing service {i+1}/{len(service_elements)}...")
-                self.process_service(service_element, i)
-                time.sleep(1.5)  # Be polite to the server
-                
+            url = self.detail_url_template.format(service_id=service_id)
+            return self.driver.execute_async_script(FETCH_HTML_SCRIPT, url)
         except Exception as e:
-            print(f"❌ Error during scraping: {str(e)}")
-            
-        return self.services_data
+            print(f"      ⚠️ Direct fetch failed, using the modal: {str(e)}")
+            return None
     
-    def process_service(self, service_element, index):
-        """Process individual service and extract description"""
+    def open_service_modal(self, service_id, index):
+        """Click a service item and read the details from its modal"""
+        if not self.driver.execute_script(OPEN_SERVICE_SCRIPT, service_id, index):
+            raise NoSuchElementException(f"Service item {service_id or index + 1} not found")
+        
+        # Extract service details once the modal appears
         try:
-            # Get service name and ID
-            service_name = service_element.text.strip()
-            service_id = service_element.get_attribute('id')
-            
-            print(f"   🎯 Clicking on: {service_name[:50]}...")
-            
-            # Scroll element into view and click
-            self.driver.execute_script("arguments[0].scrollIntoView(true);", service_element)
-            time.sleep(0.5)
-            self.driver.execute_script("arguments[0].click();", service_element)
-            
-            # Wait for modal to appear
-            time.sleep(3)
+            return self.extract_service_details()
+        finally:
+            self.close_modal()
+    
+    def process_service(self, service_id, index, service_name):
+        """Process individual service and return its details, or None on failure"""
+        try:
+            print(f"   🎯 Fetching: {service_name[:50]}...")
             
-            # Extract service details from the modal
-            service_details = self.extract_service_details()
+            # Skip the modal round-trip when the detail URL is known
+            service_details = None
+            if self.detail_url_template and service_id:
+                html = self.fetch_detail_html(service_id)
+                if html:
+                    service_details = parse_detail(html)
+            if service_details is None:
+                service_details = self.open_service_modal(service_id, index)
             
             # Store the data
             service_data = {
@@ -82,89 +271,39 @@ class PMCServicesScraper:
                 'fees': service_details.get('fees', 'No fees information')
             }
             
-            self.services_data.append(service_data)
             print(f"   ✅ Extracted: {service_name[:50]}...")
-            
-            # Close the modal
-            self.close_modal()
-            time.sleep(1)
+            return service_data
             
         except Exception as e:
             print(f"   ❌ Error processing service {index+1}: {str(e)}")
             self.close_modal()  # Try to close any open modal
+            return None
     
     def extract_service_details(self):
         """Extract service details from the modal"""
-        details = {
-            'description': 'No description available',
-            'process': 'No process available', 
-            'documents': 'No documents information',
-            'fees': 'No fees information'
-        }
+        details = dict(DEFAULT_DETAILS)
         
         try:
-            # Wait for modal to be visible
-            modal = self.wait.until(
-                EC.visibility_of_element_located((By.ID, "modelWindow"))
-            )
-            
-            # Wait a bit more for content to load
-            time.sleep(2)
-            
-            # Get the modal text content
-            modal_text = self.driver.find_element(By.ID, "modal-text")
+            # Each poll is a single driver call; the loaded HTML comes back with the last one
+            state = {}
+            def modal_loaded(driver):
+                current = self.run_script(MODAL_STATE_SCRIPT)
+                if current:
+                    state.update(current)
+                    return not current['loading']
+                return False
             
-            # Check if still loading
-            if "bouncing-loader" in modal_text.get_attribute("innerHTML"):
-                print("      ⏳ Content still loading, waiting...")
-                time.sleep(3)
-            
-            # Extract different sections
-            modal_html = modal_text.get_attribute("innerHTML")
-            
-            # Extract service description
-            if "Service Description" in modal_html:
-                try:
-                    # Look for description paragraph
-                    desc_elements = modal_text.find_elements(By.XPATH, ".//h3[contains(text(), 'Service Description')]/following-sibling::p")
-                    if desc_elements:
-                        details['description'] = desc_elements[0].text.strip()
-                except:
-                    pass
-            
-            # Extract process
-            if "Process" in modal_html:
-                try:
-                    process_elements = modal_text.find_elements(By.XPATH, ".//h3[contains(text(), 'Process')]/following-sibling::p")
-                    if process_elements:
-                        details['process'] = process_elements[0].text.strip()
-                except:
-                    pass
-            
-            # Extract documents table
-            if "Required Documents" in modal_html:
-                try:
-                    doc_tables = modal_text.find_elements(By.XPATH, ".//h3[contains(text(), 'Required Documents')]/following-sibling::table")
-                    if doc_tables:
-                        details['documents'] = doc_tables[0].text.strip()
-                except:
-                    pass
+            # Wait for the modal to open and its loading animation to be replaced
+            try:
+                self.wait.until(modal_loaded)
+            except TimeoutException:
+                if not state:
+                    raise
+                print("      ⏳ Content still loading, reading what is there...")
+                state['html'] = self.run_script(MODAL_HTML_SCRIPT)
             
-            # Extract fees table
-            if "Fees Structure" in modal_html:
-                try:
-                    fee_tables = modal_text.find_elements(By.XPATH, ".//h3[contains(text(), 'Fees Structure')]/following-sibling::table")
-                    if fee_tables:
-                        details['fees'] = fee_tables[0].text.strip()
-                except:
-                    pass
-            
-            # If no specific sections found, get all text
-            if all(v in ['No description available', 'No process available', 'No documents information', 'No fees information'] 
-                   for v in details.values()):
-                all_text = modal_text.text.strip()
-                if all_text and len(all_text) > 50:
-                    details['description'] = all_text[:500] + "..." if len(all_text) > 500 else all_text
+            # Parse all sections locally from the HTML already fetched
+            details = parse_detail(state['html'])
                     
         except TimeoutException:
             print("      ⚠️ Modal took too long to load")
@@ -175,108 +314,239 @@ class PMCServicesScraper:
     
     def close_modal(self):
         """Close the modal window"""
+        modal_closed = EC.invisibility_of_element_located((By.ID, "modelWindow"))
+        try:
+            # The page's own close function, then wait for the modal to hide
+            self.driver.execute_script("closeModelWindow();")
+            self.close_wait.until(modal_closed)
+        except Exception:
+            # Fall back to the ESC key
+            try:
+                self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
+                self.close_wait.until(modal_closed)
+            except Exception as e:
+                print(f"      ⚠️ Error closing modal: {str(e)}")
+    
+    def close(self):
+        """Hand the browser back to the pool"""
+        release_driver(self.driver)
+
+class PMCServicesScraper:
+    def __init__(self, headless=True, workers=4, detail_url_template=None,
+                 jsonl_path="pmc_services.jsonl", csv_path="pmc_services.csv",
+                 wait_timeout=8, poll=0.15, profile_dir="~/.pmc_scraper_profile"):
+        """Initialize the Chrome options and open the output files
+
+        detail_url_template (e.g. "https://services.pmc.gov.in/...?id={service_id}")
+        lets workers fetch each service's detail HTML directly instead of opening
+        its modal. Each scraped service is appended to jsonl_path and csv_path as
+        soon as it completes, so progress survives a crash. wait_timeout bounds how
+        long a worker waits for the page or a modal, checking every poll seconds.
+        Local browsers keep their profiles and HTTP caches under profile_dir;
+        pass None to start each one with a fresh temporary profile.
+        """
+        chrome_options = Options()
+        if headless:
+            chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        
+        # Keep Chrome's own logging to fatal errors only
+        chrome_options.add_argument("--log-level=3")
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-logging"])
+        
+        # The scraper only reads text, so skip images and background work. The
+        # content setting stops image requests in remote browsers too; stylesheets
+        # stay on because the modal's visibility comes from them
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_argument("--disable-features=TranslateUI")
+        
+        # Return from driver.get at DOMContentLoaded; explicit waits cover the rest
+        chrome_options.page_load_strategy = 'eager'
+        
+        self.chrome_options = chrome_options
+        self.workers = workers
+        self.detail_url_template = detail_url_template
+        self.wait_timeout = wait_timeout
+        self.poll = poll
+        self.profile_dir = os.path.expanduser(profile_dir) if profile_dir else None
+        self.services_data = []  # First few services, for display_summary
+        self._count = 0
+        self._lock = threading.Lock()
+        self._active_workers = set()
+        self._stop = threading.Event()  # Set on Ctrl-C so workers stop taking services
+        
+        self.jsonl_path = jsonl_path
+        self.csv_path = csv_path
+        self._jsonl = open(jsonl_path, 'ab')
+        self._csv_file = open(csv_path, 'a', newline='', encoding='utf-8')
+        self._csv = csv.writer(self._csv_file)
+        if self._csv_file.tell() == 0:
+            self._csv.writerow(FIELDNAMES)
+        
+    def start_worker(self, url):
+        """Start a browser on the services page"""
+        worker = ServiceWorker(
+            self.chrome_options, url, self.detail_url_template, self.wait_timeout, self.poll,
+            self.profile_dir
+        )
+        with self._lock:
+            self._active_workers.add(worker)
+        worker.load_services_page()
+        return worker
+    
+    def stop_worker(self, worker):
+        """Close a worker's browser unless close() already did"""
+        with self._lock:
+            if worker not in self._active_workers:
+                return
+            self._active_workers.discard(worker)
+        worker.close()
+        
+    def scrape_services(self, url="https://services.pmc.gov.in/home"):
+        """Main method to scrape all services"""
+        print("🚀 Loading PMC services page...")
+        print("⏳ Waiting for services to load...")
+        first_worker = self.start_worker(url)
+        
         try:
-            # Try multiple ways to close the modal
-            close_methods = [
-                # Try the close function
-                lambda: self.driver.execute_script("closeModelWindow();"),
-                # Try clicking the X button
-                lambda: self.driver.find_element(By.CSS_SELECTOR, "span[onclick*='closeModelWindow']").click(),
-                # Try ESC key
-                lambda: self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE),
-                # Try clicking outside modal
-                lambda: self.driver.find_element(By.ID, "modelWindow").click()
-            ]
+            # Collect the ID and name of every service item in one driver call
+            services = first_worker.run_script(
+                "return Array.from(document.querySelectorAll('.service-item'), e => [e.id, e.innerText.trim()]);"
+            )
+            print(f"✅ Found {len(services)} services to process")
             
-            for method in close_methods:
+            if not services:
+                print("❌ No service items found! Check if page loaded correctly.")
+                self.stop_worker(first_worker)
+                return self._count
+            
+            queue = Queue()
+            for index, (service_id, service_name) in enumerate(services):
+                queue.put((index, service_id, service_name))
+                
+            # Each worker drives its own browser; the first one reuses the session above
+            worker_count = min(self.workers, len(services))
+            print(f"👷 Starting {worker_count} browser workers...")
+            with ThreadPoolExecutor(max_workers=worker_count) as executor:
+                futures = [
+                    executor.submit(self.run_worker, first_worker if i == 0 else None, url, queue, len(services))
+                    for i in range(worker_count)
+                ]
                 try:
-                    method()
-                    time.sleep(0.5)
-                    # Check if modal is closed
-                    modal = self.driver.find_element(By.ID, "modelWindow")
-                    if modal.get_attribute("style") == "display: none;":
-                        break
-                except:
-                    continue
-                    
+                    for future in futures:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            print(f"❌ Worker failed: {str(e)}")
+                except BaseException:
+                    # Ctrl-C: let workers finish their current service, not the catalog
+                    self._stop.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                
         except Exception as e:
-            print(f"      ⚠️ Error closing modal: {str(e)}")
+            print(f"❌ Error during scraping: {str(e)}")
+        finally:
+            self.stop_worker(first_worker)
+            
+        return self._count
     
-    def save_to_json(self, filename="pmc_services.json"):
-        """Save scraped data to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.services_data, f, indent=2, ensure_ascii=False)
-        print(f"💾 Data saved to {filename}")
+    def run_worker(self, worker, url, queue, total):
+        """Process services from the queue until it is empty"""
+        try:
+            if worker is None:
+                worker = self.start_worker(url)
+                
+            while not self._stop.is_set():
+                try:
+                    index, service_id, service_name = queue.get_nowait()
+                except Empty:
+                    break
+                    
+                print(f"📋 Processing service {index+1}/{total}...")
+                service_data = worker.process_service(service_id, index, service_name)
+                if service_data is not None:
+                    self.write_service(service_data)
+                self._stop.wait(1.5)  # Be polite to the server
+        finally:
+            if worker is not None:
+                self.stop_worker(worker)
     
-    def save_to_csv(self, filename="pmc_services.csv"):
-        """Save scraped data to CSV file"""
-        if not self.services_data:
-            print("❌ No data to save")
-            return
+    def write_service(self, service_data):
+        """Append one scraped service to the JSON lines and CSV outputs"""
+        with self._lock:
+            self._jsonl.write(orjson.dumps(service_data, option=orjson.OPT_APPEND_NEWLINE))
+            self._csv.writerow([service_data[field] for field in FIELDNAMES])
+            self._jsonl.flush()
+            self._csv_file.flush()
             
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['index', 'service_id', 'name', 'description', 'process', 'documents', 'fees']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for service in self.services_data:
-                writer.writerow(service)
-        
-        print(f"💾 Data saved to {filename}")
+            self._count += 1
+            if len(self.services_data) < PREVIEW_SIZE:
+                self.services_data.append(service_data)
+    
+    def close_output(self):
+        """Close the output files"""
+        with self._lock:
+            if self._jsonl.closed:
+                return
+            self._jsonl.close()
+            self._csv_file.close()
+        print(f"💾 Data saved to {self.jsonl_path} and {self.csv_path}")
     
     def display_summary(self):
         """Display a summary of scraped data"""
-        if not self.services_data:
+        if not self._count:
             print("❌ No services were scraped")
             return
             
         print(f"\n🎉 SCRAPING COMPLETED SUCCESSFULLY!")
-        print(f"📊 Total services scraped: {len(self.services_data)}")
-        
-        # Count by department
-        departments = {}
-        for service in self.services_data:
-            # Try to extract department from service name or ID
-            dept = "Unknown Department"
-            departments[dept] = departments.get(dept, 0) + 1
+        print(f"📊 Total services scraped: {self._count}")
         
         print(f"\n📋 Sample of scraped services:")
-        for i, service in enumerate(self.services_data[:5]):
+        for i, service in enumerate(self.services_data):
             print(f"\n{i+1}. {service['name']}")
             print(f"   ID: {service['service_id']}")
             print(f"   Description: {service['description'][:100]}...")
             
-        if len(self.services_data) > 5:
-            print(f"\n... and {len(self.services_data) - 5} more services")
+        if self._count > len(self.services_data):
+            print(f"\n... and {self._count - len(self.services_data)} more services")
     
     def close(self):
-        """Close the browser"""
-        self.driver.quit()
+        """Close any browsers still open and the output files"""
+        with self._lock:
+            workers = list(self._active_workers)
+            self._active_workers.clear()
+        for worker in workers:
+            worker.close()
+        self.close_output()
 
 def main():
     """Main function to run the scraper"""
     print("🏛️ PMC Services Scraper Starting...")
     
     # Create scraper instance
-    scraper = PMCServicesScraper(headless=False)  # Set to True for headless mode
+    scraper = PMCServicesScraper(
+        headless=True,  # Set to False to watch the browser
+        detail_url_template=os.getenv('PMC_DETAIL_URL_TEMPLATE')  # Optional direct detail URL
+    )
     
     try:
-        # Scrape the services
-        services = scraper.scrape_services()
+        # Scrape the services; each one is saved as soon as it completes
+        scraper.scrape_services()
         
         # Display results
         scraper.display_summary()
         
-        # Save data in both formats
-        scraper.save_to_json()
-        scraper.save_to_csv()
-        
     except KeyboardInterrupt:
         print("\n⏹️ Scraping interrupted by user")
     except Exception as e:
         print(f"💥 Scraping failed: {str(e)}")
     finally:
         scraper.close()
+        shutdown_driver_pool()
         print("🔚 Browser closed")
 
 if __name__ == "__main__":